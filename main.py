@@ -1,100 +1,69 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
-from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime
-from sqlalchemy.orm import sessionmaker, relationship, declarative_base
-from datetime import datetime
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import inspect, insert, select, update
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import errno
+import logging
 import os
 import shutil
-from pypdf import PdfWriter
+import tempfile
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+import pikepdf
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 
-# Database setup (SQLite for Render)
-DATABASE_URL = "sqlite:///./database.db"
-
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-
-# Database models
-class Project(Base):
-    __tablename__ = "project"
-    id = Column(Integer, primary_key=True, index=True)
-    project_name = Column(String, nullable=False)
-    project_code = Column(String, unique=True, nullable=False)
-    location = Column(String)
-    production_logs = relationship("ProductionLog", back_populates="project")
-    qc_logs = relationship("QCLog", back_populates="project")
-
-
-class ProductionLog(Base):
-    __tablename__ = "production_log"
-    id = Column(Integer, primary_key=True, index=True)
-    panel_id = Column(String, unique=True, nullable=False)
-    product_type = Column(String)
-    quantity = Column(Integer)
-    project_id = Column(Integer, ForeignKey("project.id"))
-    project = relationship("Project", back_populates="production_logs")
-    qc_logs = relationship("QCLog", back_populates="production_log")
-
-
-class QCLog(Base):
-    __tablename__ = "qc_log"
-    id = Column(Integer, primary_key=True, index=True)
-    panel_id = Column(String, nullable=False)
-    inspection_date = Column(DateTime, default=datetime.utcnow)
-    inspector_name = Column(String)
-    status = Column(String, default="Pending")
-    remarks = Column(Text)
-    project_id = Column(Integer, ForeignKey("project.id"))
-    production_log_id = Column(Integer, ForeignKey("production_log.id"))
-    project = relationship("Project", back_populates="qc_logs")
-    production_log = relationship("ProductionLog", back_populates="qc_logs")
-
-
-class ChecklistTemplate(Base):
-    __tablename__ = "checklist_template"
-    id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("project.id"))
-    template_name = Column(String, nullable=False)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-
-
-class MIRMaster(Base):
-    __tablename__ = "mir_master"
-    id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("project.id"))
-    mir_number = Column(String, unique=True, nullable=False)
-    status = Column(String, default="Draft")
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-
-class MIRPanel(Base):
-    __tablename__ = "mir_panel"
-    id = Column(Integer, primary_key=True, index=True)
-    mir_id = Column(Integer, ForeignKey("mir_master.id"))
-    panel_id = Column(String, nullable=False)
-
-class MIRTemplate(Base):
-    __tablename__ = "mir_template"
-    id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("project.id"))
-    template_name = Column(String, nullable=False)
-    template_type = Column(String, default="cover_page")  # cover_page, panel_list, custom
-    file_path = Column(String, nullable=False)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-
-
-# Create tables
+from database import Base, SessionLocal, engine
+from models import Project, ProductionLog, QCLog, ChecklistTemplate, MIRMaster, MIRPanel, MIRTemplate
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+# Create tables, and any indexes added since the tables were first created
 Base.metadata.create_all(bind=engine)
+for table in Base.metadata.sorted_tables:
+    for table_index in table.indexes:
+        table_index.create(bind=engine, checkfirst=True)
+
+# Add the MIR counter to project tables created before it existed, seeded
+# from each project's latest MIR number
+if "next_mir_seq" not in {column["name"] for column in inspect(engine).get_columns("project")}:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE project ADD COLUMN next_mir_seq INTEGER NOT NULL DEFAULT 0")
+        last_nums = {}
+        for project_id, mir_number in conn.execute(
+            select(MIRMaster.project_id, MIRMaster.mir_number).order_by(MIRMaster.id)
+        ):
+            last_nums[project_id] = int(mir_number.split("-")[-1])
+        for project_id, last_num in last_nums.items():
+            conn.execute(update(Project).where(Project.id == project_id).values(next_mir_seq=last_num))
 
 # FastAPI app
 app = FastAPI(title="QAQC System", version="0.1.0")
 
+# When served behind nginx, set to the internal location that maps to the app
+# directory (e.g. "/protected") so nginx sends MIR PDFs itself
+ACCEL_REDIRECT_PREFIX = os.environ.get("ACCEL_REDIRECT_PREFIX")
+
+# A background MIR job lost with its worker leaves the row at "Processing";
+# the MIR list flags such rows as stale once they are older than this
+MIR_PROCESSING_TIMEOUT = timedelta(minutes=30)
+
+
+class PDFFileResponse(FileResponse):
+    """FileResponse that streams large merged PDFs in bigger chunks"""
+    chunk_size = 256 * 1024
+
 
 # Pydantic models
 class ProjectCreate(BaseModel):
@@ -118,6 +87,28 @@ class QCLogCreate(BaseModel):
     production_log_id: int
 
 
+class ProjectOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    project_name: str
+    project_code: str
+    location: str | None = None
+
+
+class QCLogOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    panel_id: str
+    inspection_date: datetime | None = None
+    inspector_name: str | None = None
+    status: str | None = None
+    remarks: str | None = None
+    project_id: int | None = None
+    production_log_id: int | None = None
+
+
 # Database session dependency
 def get_db():
     db = SessionLocal()
@@ -128,107 +119,261 @@ def get_db():
 
 
 # Helper functions
-def generate_mir_number(project_code: str, db_session) -> str:
-    """Generate sequential MIR number for a project"""
-    last_mir = (
-        db_session.query(MIRMaster)
-        .filter(MIRMaster.mir_number.like(f"{project_code}-MIR-%"))
-        .order_by(MIRMaster.id.desc())
-        .first()
-    )
-
-    if last_mir:
-        last_num = int(last_mir.mir_number.split("-")[-1])
-        new_num = last_num + 1
+@dataclass(frozen=True)
+class MirPaths:
+    label: str
+    base: str
+    source_files: str
+    merged_pdf: str
+    final_mir: str
+    final_pdf: str
+
+
+def mir_paths(project_id: int, project_code: str, mir_number: str) -> MirPaths:
+    """Build the storage paths of an MIR"""
+    # Legacy MIR-NNNN numbers lack the project code, which their folders carry
+    if mir_number.startswith(f"{project_code}-"):
+        label = mir_number
     else:
-        new_num = 1
-
-    return f"MIR-{new_num:04d}"
-
+        label = f"{project_code}-{mir_number}"
+    base = f"storage/project_{project_id}/MIR/{label}"
+    return MirPaths(
+        label=label,
+        base=base,
+        source_files=f"{base}/source_files",
+        merged_pdf=f"{base}/merged_pdf",
+        final_mir=f"{base}/final_mir",
+        final_pdf=f"{base}/FINAL_MIR.pdf",
+    )
 
-def create_mir_folder(project_id: int, mir_number: str, panel_ids: list[str], db_session):
-    """Create folder structure for MIR with subfolders and index"""
-    project = db_session.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        return
 
-    mir_folder = f"storage/project_{project_id}/MIR/{project.project_code}-{mir_number}"
-    os.makedirs(mir_folder, exist_ok=True)
+def generate_mir_number(project_id: int, project_code: str, db_session) -> str:
+    """Generate sequential MIR number for a project"""
+    # Bumping the counter takes SQLite's write lock before the number is
+    # read, so concurrent requests can't be handed the same number
+    new_num = db_session.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(next_mir_seq=Project.next_mir_seq + 1)
+        .returning(Project.next_mir_seq)
+    ).scalar_one()
 
-    subfolders = ["source_files", "merged_pdf", "final_mir"]
-    for subfolder in subfolders:
-        os.makedirs(f"{mir_folder}/{subfolder}", exist_ok=True)
+    return f"{project_code}-MIR-{new_num:04d}"
 
-    index_file = f"{mir_folder}/index.txt"
-    with open(index_file, "w") as f:
-        f.write(f"MIR Number: {project.project_code}-{mir_number}\n")
-        f.write(f"Project: {project.project_name}\n")
-        f.write(f"Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write("\nPanel IDs:\n")
-        for panel_id in panel_ids:
-            f.write(f"  - {panel_id}\n")
 
+def create_mir_folder(paths: MirPaths, project_name: str, panel_ids: list[str]):
+    """Create folder structure for MIR with subfolders and index"""
+    for subfolder in [paths.source_files, paths.merged_pdf, paths.final_mir]:
+        os.makedirs(subfolder, exist_ok=True)
+
+    index_file = f"{paths.base}/index.txt"
+    lines = [
+        f"MIR Number: {paths.label}\n",
+        f"Project: {project_name}\n",
+        f"Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+        "\nPanel IDs:\n",
+        *(f"  - {panel_id}\n" for panel_id in panel_ids),
+    ]
+    Path(index_file).write_text("".join(lines))
+
+
+def fast_copy(src: str, dst: str):
+    """Copy a file in the kernel with copy_file_range, falling back to a buffered copy"""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                while copied < size:
+                    # Some filesystems report 0 before EOF, so stop on it and check the total
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                    if not n:
+                        break
+                    copied += n
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                    raise
+
+        if copied != size:
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst, length=1024 * 1024)
+    shutil.copystat(src, dst)
+
+
+# ioctl request that clones a file's extents (Btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+
+def link_or_copy(src: str, dst: str):
+    """Hardlink src to dst, falling back to a reflink clone and then a full copy"""
+    # Never write through an existing link to a source file
+    try:
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
 
-def attach_documents_to_mir(project_id: int, mir_number: str, panel_ids: list[str]):
-    """Copy all documents from production logs to MIR source_files folder"""
-    mir_folder = f"storage/project_{project_id}/MIR/{project_id}-{mir_number}"
-    source_files_folder = f"{mir_folder}/source_files"
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            # Don't leave the empty clone target behind
+            try:
+                os.remove(dst)
+            except FileNotFoundError:
+                pass
+
+    fast_copy(src, dst)
+
+
+def attach_documents_to_mir(project_id: int, paths: MirPaths, panel_ids: list[str]):
+    """Link or copy all documents from production logs to MIR source_files folder"""
+    source_files_folder = paths.source_files
     os.makedirs(source_files_folder, exist_ok=True)
 
+    # Bind hot-loop lookups as locals
+    join = os.path.join
+    exists = os.path.exists
+    isdir = os.path.isdir
+
     for panel_id in panel_ids:
         panel_folder = f"storage/project_{project_id}/production_logs/{panel_id}"
-        if not os.path.exists(panel_folder):
+        if not exists(panel_folder):
             continue
 
         for subfolder in ["checklists", "drawings", "photos"]:
             source_path = f"{panel_folder}/{subfolder}"
 
-            if os.path.exists(source_path) and os.path.isdir(source_path):
-                for filename in os.listdir(source_path):
-                    file_path = os.path.join(source_path, filename)
-                    if os.path.isfile(file_path):
-                        dest_filename = f"{panel_id}_{subfolder}_{filename}"
-                        dest_path = os.path.join(source_files_folder, dest_filename)
-                        shutil.copy2(file_path, dest_path)
+            if isdir(source_path):
+                with os.scandir(source_path) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False):
+                            dest_filename = f"{panel_id}_{subfolder}_{entry.name}"
+                            dest_path = join(source_files_folder, dest_filename)
+                            link_or_copy(entry.path, dest_path)
+
+
+# Most source PDFs a merge holds open at once; each one is a file descriptor
+MERGE_BATCH_SIZE = 64
+
+
+def concat_pdfs(file_paths: list[str], output_pdf: str, work_dir: str):
+    """Concatenate PDFs in order, opening at most MERGE_BATCH_SIZE of them at a time"""
+    if len(file_paths) > MERGE_BATCH_SIZE:
+        # Merge in batches into intermediate files under work_dir, then merge those
+        with tempfile.TemporaryDirectory(dir=work_dir) as batch_dir:
+            batch_pdfs = []
+            for start in range(0, len(file_paths), MERGE_BATCH_SIZE):
+                batch_pdf = os.path.join(batch_dir, f"batch_{start:06d}.pdf")
+                concat_pdfs(file_paths[start:start + MERGE_BATCH_SIZE], batch_pdf, work_dir)
+                batch_pdfs.append(batch_pdf)
+            concat_pdfs(batch_pdfs, output_pdf, work_dir)
+        return
+
+    # Source PDFs must stay open until save: qpdf copies stream data lazily.
+    # They are read as streams, not mmapped: most are hardlinks to production
+    # documents, and one truncated mid-merge would SIGBUS the worker
+    with ExitStack() as stack, pikepdf.Pdf.new() as merged:
+        for file_path in file_paths:
+            src = stack.enter_context(pikepdf.Pdf.open(file_path, access_mode=pikepdf.AccessMode.stream))
+            merged.pages.extend(src.pages)
 
+        merged.save(output_pdf)
 
-def merge_mir_pdfs(project_id: int, mir_number: str, db_session):
+
+def merge_mir_pdfs(paths: MirPaths):
     """Merge all PDFs from source_files into FINAL_MIR.pdf"""
-    project = db_session.query(Project).filter(Project.id == project_id).first()
-    if not project:
-                return None
-    
-    base_path = f"storage/project_{project_id}/MIR/{project.project_code}-{mir_number}"
-    mir_path = f"{base_path}/source_files"
-    output_pdf = f"{base_path}/FINAL_MIR.pdf"
+    mir_path = paths.source_files
+    output_pdf = paths.final_pdf
     if not os.path.exists(mir_path):
         return None
 
-    merger = PdfWriter()
-
     ordered_groups = ["MIR_FORM_", "PANEL_LIST_", "CHECKLIST", "DRAWING_", "PHOTO"]
-    files = os.listdir(mir_path)
 
-    for group in ordered_groups:
-        for file in sorted(files):
-            if file.endswith(".pdf") and group in file:
-                merger.append(os.path.join(mir_path, file))
+    # Bucket each PDF under the first group it matches, in one directory pass
+    buckets = {group: [] for group in ordered_groups}
+    with os.scandir(mir_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".pdf"):
+                group = next((g for g in ordered_groups if g in entry.name), None)
+                if group:
+                    buckets[group].append(entry.path)
 
-    with open(output_pdf, "wb") as output_file:
-        merger.write(output_file)
+    merge_order = [file_path for group in ordered_groups for file_path in sorted(buckets[group])]
+
+    # Save beside the final file and swap it in, so downloads never see a partial PDF
+    os.makedirs(paths.merged_pdf, exist_ok=True)
+    tmp_pdf = f"{output_pdf}.tmp"
+    try:
+        concat_pdfs(merge_order, tmp_pdf, paths.merged_pdf)
+        os.replace(tmp_pdf, output_pdf)
+    except Exception:
+        if os.path.exists(tmp_pdf):
+            os.remove(tmp_pdf)
+        raise
 
-    merger.close()
     return output_pdf
 
 
+def finalize_mir(mir_id: int, project_id: int, mir_number: str, panel_ids: list[str]):
+    """Build the MIR folder and merged PDF, then record the outcome on the MIR"""
+    db = SessionLocal()
+    try:
+        mir = db.get(MIRMaster, mir_id)
+        if not mir:
+            return
+
+        try:
+            project = db.get(Project, project_id)
+            if not project:
+                raise LookupError(f"Project {project_id} not found")
+
+            paths = mir_paths(project_id, project.project_code, mir_number)
+            create_mir_folder(paths, project.project_name, panel_ids)
+
+            # Generate PDF documents
+            generate_mir_cover_page(project_id, mir_number, panel_ids, db)
+            generate_panel_list_pdf(project_id, mir_number, panel_ids, db)
+            attach_documents_to_mir(project_id, paths, panel_ids)
+            final_pdf = merge_mir_pdfs(paths)
+        except Exception as exc:
+            # The session may be unusable after a database error
+            db.rollback()
+            mir.status = "Failed"
+            try:
+                db.commit()
+            except Exception as commit_exc:
+                # Keep the generation error as the one that propagates
+                logger.exception("Could not mark MIR %s as Failed", mir_number)
+                raise exc from commit_exc
+            raise
+
+        mir.status = "Final" if final_pdf else "Ready"
+        db.commit()
+    finally:
+        db.close()
+
+
 # API Routes
-@app.get("/projects")
+@app.get("/projects", response_model=list[ProjectOut])
 def list_projects(db=Depends(get_db)):
-    projects = db.query(Project).all()
+    projects = db.execute(
+        select(Project.id, Project.project_name, Project.project_code, Project.location)
+    ).all()
     return projects
 
 
-@app.post("/projects")
+@app.post("/projects", response_model=ProjectOut)
 def create_project(project: ProjectCreate, db=Depends(get_db)):
     db_project = Project(
         project_name=project.project_name,
@@ -260,9 +405,20 @@ def create_production_log(log: ProductionLogCreate, db=Depends(get_db)):
     return db_log
 
 
-@app.get("/qc-logs")
+@app.get("/qc-logs", response_model=list[QCLogOut])
 def list_qc_logs(db=Depends(get_db)):
-    qc_logs = db.query(QCLog).all()
+    qc_logs = db.execute(
+        select(
+            QCLog.id,
+            QCLog.panel_id,
+            QCLog.inspection_date,
+            QCLog.inspector_name,
+            QCLog.status,
+            QCLog.remarks,
+            QCLog.project_id,
+            QCLog.production_log_id,
+        )
+    ).all()
     return qc_logs
 
 
@@ -295,7 +451,7 @@ async def upload_mir_template(
     db=Depends(get_db)
 ):
     """Upload MIR template PDF for a project"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -303,11 +459,10 @@ async def upload_mir_template(
     template_folder = f"storage/project_{project_id}/templates"
     os.makedirs(template_folder, exist_ok=True)
     
-    # Save uploaded file
+    # Save uploaded file, streaming 1 MiB chunks off the event loop
     file_path = f"{template_folder}/{template_type}_{file.filename}"
     with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+        await run_in_threadpool(shutil.copyfileobj, file.file, f, 1024 * 1024)
     
     # Save template record in database
     template = MIRTemplate(
@@ -327,38 +482,39 @@ async def upload_mir_template(
     }
 
 @app.post("/projects/{project_id}/mir")
-def create_mir(project_id: int, panel_ids: list[str], db=Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+def create_mir(
+    project_id: int,
+    panel_ids: list[str],
+    background_tasks: BackgroundTasks,
+    db=Depends(get_db)
+):
+    """Create an MIR record and queue its document generation in the background"""
+    project_code = db.execute(
+        select(Project.project_code).where(Project.id == project_id)
+    ).scalar_one_or_none()
+    if not project_code:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    mir_number = generate_mir_number(project.project_code, db)
+    mir_number = generate_mir_number(project_id, project_code, db)
 
-    mir = MIRMaster(project_id=project_id, mir_number=mir_number)
+    mir = MIRMaster(project_id=project_id, mir_number=mir_number, status="Processing")
     db.add(mir)
-    db.commit()
-    db.refresh(mir)
+    db.flush()
 
-    for panel in panel_ids:
-        db.add(MIRPanel(mir_id=mir.id, panel_id=panel))
+    if panel_ids:
+        db.execute(
+            insert(MIRPanel),
+            [{"mir_id": mir.id, "panel_id": panel} for panel in panel_ids],
+        )
     db.commit()
 
-    create_mir_folder(project_id, mir_number, panel_ids, db)
-    
-    # Generate PDF documents
-    generate_mir_cover_page(project_id, mir_number, panel_ids, db)
-    generate_panel_list_pdf(project_id, mir_number, panel_ids, db)
-    attach_documents_to_mir(project_id, mir_number, panel_ids)
-    final_pdf = merge_mir_pdfs(project_id, mir_number, db)
-
-    mir.status = "Final" if final_pdf else "Ready"
-    db.commit()
+    # Folder, PDF generation and merge run after the response is sent
+    background_tasks.add_task(finalize_mir, mir.id, project_id, mir_number, panel_ids)
 
     return {
         "mir_number": mir_number,
         "status": mir.status,
-        "folder_created": True,
-        "pdf_merged": final_pdf is not None,
+        "status_url": f"/projects/{project_id}/mir/list",
     }
 
 # ============== PDF DOWNLOAD ENDPOINTS ==============
@@ -375,26 +531,28 @@ def download_mir_pdf(
     
     Args:
         project_id: Project ID number
-        mir_number: MIR number (e.g., MIR-0001)
+        mir_number: MIR number (e.g., PRJ-MIR-0001)
         view: If True, opens in browser. If False, downloads.
     
     Example URLs:
-        Download: /projects/1/mir/MIR-0001/pdf
-        View: /projects/1/mir/MIR-0001/pdf?view=true
+        Download: /projects/1/mir/PRJ-MIR-0001/pdf
+        View: /projects/1/mir/PRJ-MIR-0001/pdf?view=true
     """
-    from fastapi.responses import FileResponse
-    from pathlib import Path
-    
     # Get project to get project_code
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+    project_code = db.execute(
+        select(Project.project_code).where(Project.id == project_id)
+    ).scalar_one_or_none()
+    if not project_code:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Build PDF path
-    pdf_path = Path(f"storage/project_{project_id}/MIR/{project.project_code}-{mir_number}/FINAL_MIR.pdf")
+    paths = mir_paths(project_id, project_code, mir_number)
+    pdf_path = Path(paths.final_pdf)
     
-    # Check if file exists
-    if not pdf_path.exists():
+    # Check if file exists (stat once and reuse it for the response)
+    try:
+        stat_result = pdf_path.stat()
+    except FileNotFoundError:
         raise HTTPException(
             status_code=404,
             detail={
@@ -408,14 +566,20 @@ def download_mir_pdf(
     # Set headers for download or view
     disposition = "inline" if view else "attachment"
     headers = {
-        "Content-Disposition": f'{disposition}; filename="{project.project_code}-{mir_number}.pdf"'
+        "Content-Disposition": f'{disposition}; filename="{paths.label}.pdf"'
     }
     
-    return FileResponse(
+    # Hand the transfer off to nginx when running behind it
+    if ACCEL_REDIRECT_PREFIX:
+        headers["X-Accel-Redirect"] = f"{ACCEL_REDIRECT_PREFIX.rstrip('/')}/{pdf_path.as_posix()}"
+        return Response(media_type="application/pdf", headers=headers)
+    
+    return PDFFileResponse(
         path=str(pdf_path),
         media_type="application/pdf",
         headers=headers,
-        filename=f"{project.project_code}-{mir_number}.pdf"
+        filename=f"{paths.label}.pdf",
+        stat_result=stat_result
     )
 
 @app.get("/projects/{project_id}/mir/list")
@@ -425,34 +589,36 @@ def list_project_mirs(project_id: int, db = Depends(get_db)):
     
     Returns information about all generated MIRs including:
     - MIR number
-    - Status
+    - Status, flagged stale if stuck in Processing past MIR_PROCESSING_TIMEOUT
     - File size
     - Download URL
     """
-    from pathlib import Path
-    
-    project = db.query(Project).filter(Project.id == project_id).first()
+    # Load project and all its MIRs together
+    project = db.get(Project, project_id, options=[selectinload(Project.mirs)])
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Get all MIRs from database
-    mirs = db.query(MIRMaster).filter(MIRMaster.project_id == project_id).all()
-    
+    stale_before = datetime.utcnow() - MIR_PROCESSING_TIMEOUT
     result = []
-    for mir in mirs:
-        pdf_path = Path(f"storage/project_{project_id}/MIR/{project.project_code}-{mir.mir_number}/FINAL_MIR.pdf")
+    for mir in project.mirs:
+        pdf_path = mir_paths(project_id, project.project_code, mir.mir_number).final_pdf
+        try:
+            pdf_size = os.stat(pdf_path).st_size
+        except FileNotFoundError:
+            pdf_size = None
         
         mir_info = {
             "mir_number": mir.mir_number,
             "status": mir.status,
+            "stale": mir.status == "Processing" and mir.created_at is not None and mir.created_at < stale_before,
             "created_at": mir.created_at.isoformat() if mir.created_at else None,
-            "pdf_exists": pdf_path.exists(),
-            "download_url": f"/projects/{project_id}/mir/{mir.mir_number}/pdf" if pdf_path.exists() else None
+            "pdf_exists": pdf_size is not None,
+            "download_url": f"/projects/{project_id}/mir/{mir.mir_number}/pdf" if pdf_size is not None else None
         }
         
-        if pdf_path.exists():
-            mir_info["size_bytes"] = pdf_path.stat().st_size
-            mir_info["size_mb"] = round(pdf_path.stat().st_size / (1024 * 1024), 2)
+        if pdf_size is not None:
+            mir_info["size_bytes"] = pdf_size
+            mir_info["size_mb"] = round(pdf_size / (1024 * 1024), 2)
         
         result.append(mir_info)
     
@@ -468,7 +634,6 @@ def health_check():
     """
     Health check endpoint for monitoring
     """
-    from pathlib import Path
     return {
         "status": "healthy",
         "service": "QC System Backend",
@@ -1,75 +1,97 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship, configure_mappers
 from database import Base
 from datetime import datetime
 
-class Project(Base):
-    __tablename__ = "projects"
 
+class Project(Base):
+    __tablename__ = "project"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
-    project_code = Column(String, nullable=False, default="UNKNOWN")
-    qa_qc_engineer = Column(String, nullable=False)
-    production_engineer = Column(String, nullable=False)
-    foreman = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    project_name = Column(String, nullable=False)
+    project_code = Column(String, unique=True, nullable=False)
+    location = Column(String)
+    # Last MIR sequence number handed out for this project
+    next_mir_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    production_logs = relationship("ProductionLog", back_populates="project")
+    qc_logs = relationship("QCLog", back_populates="project")
+    mirs = relationship("MIRMaster", back_populates="project")
+
 
 class ProductionLog(Base):
-    __tablename__ = "production_logs"
+    __tablename__ = "production_log"
+    __table_args__ = (Index("ix_prodlog_project_id", "project_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    panel_id = Column(String, unique=True, nullable=False)
+    product_type = Column(String)
+    quantity = Column(Integer)
+    project_id = Column(Integer, ForeignKey("project.id"))
+    project = relationship("Project", back_populates="production_logs")
+    qc_logs = relationship("QCLog", back_populates="production_log")
 
+
+class QCLog(Base):
+    __tablename__ = "qc_log"
+    __table_args__ = (Index("ix_qclog_project_id", "project_id"),)
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
     panel_id = Column(String, nullable=False)
-    activity = Column(String, nullable=False)
-    quantity = Column(Integer, default=1)
-    remarks = Column(String)
-    log_date = Column(DateTime, default=datetime.utcnow)
+    inspection_date = Column(DateTime, default=datetime.utcnow)
+    inspector_name = Column(String)
+    status = Column(String, default="Pending")
+    remarks = Column(Text)
+    project_id = Column(Integer, ForeignKey("project.id"))
+    production_log_id = Column(Integer, ForeignKey("production_log.id"))
+    project = relationship("Project", back_populates="qc_logs")
+    production_log = relationship("ProductionLog", back_populates="qc_logs")
+
+
+class ChecklistTemplate(Base):
+    __tablename__ = "checklist_template"
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("project.id"))
+    template_name = Column(String, nullable=False)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
 
-class QCLog(Base):
-    __tablename__ = "qc_logs"
 
+class MIRMaster(Base):
+    __tablename__ = "mir_master"
+    __table_args__ = (Index("ix_mir_project_number", "project_id", "id"),)
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    production_log_id = Column(Integer, ForeignKey("production_logs.id"))
+    project_id = Column(Integer, ForeignKey("project.id"))
+    mir_number = Column(String, unique=True, nullable=False)
+    status = Column(String, default="Draft")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    project = relationship("Project", back_populates="mirs")
+
+
+class MIRPanel(Base):
+    __tablename__ = "mir_panel"
+    __table_args__ = (Index("ix_mirpanel_mir_id", "mir_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    mir_id = Column(Integer, ForeignKey("mir_master.id"))
     panel_id = Column(String, nullable=False)
-    activity = Column(String, nullable=False)
-    inspection_status = Column(String, default="Draft")
-    approved_by = Column(String, nullable=True)
-    approved_at = Column(DateTime, nullable=True)
-    remarks = Column(String, nullable=True)
 
-class ChecklistTemplate(Base):
-    __tablename__ = "checklist_templates"
 
-    id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    checklist_type = Column(String, nullable=False)
+class MIRTemplate(Base):
+    __tablename__ = "mir_template"
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("project.id"))
+    template_name = Column(String, nullable=False)
+    template_type = Column(String, default="cover_page")  # cover_page, panel_list, custom
     file_path = Column(String, nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
-class PanelChecklist(Base):
-    __tablename__ = "panel_checklists"
 
-    id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    qc_log_id = Column(Integer, ForeignKey("qc_logs.id"))
+class PanelChecklist(Base):
+    __tablename__ = "panel_checklist"
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("project.id"))
+    qc_log_id = Column(Integer, ForeignKey("qc_log.id"))
     panel_id = Column(String, nullable=False)
     checklist_type = Column(String, nullable=False)
     generated_file_path = Column(String, nullable=False)
     status = Column(String, default="Draft")
     created_at = Column(DateTime, default=datetime.utcnow)
 
-class MIRMaster(Base):
-    __tablename__ = "mir_master"
-
-    id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    mir_number = Column(String, unique=True, nullable=False)
-    status = Column(String, default="Draft")
-    created_at = Column(DateTime, default=datetime.utcnow)
 
-class MIRPanel(Base):
-    __tablename__ = "mir_panels"
-
-    id = Column(Integer, primary_key=True)
-    mir_id = Column(Integer, ForeignKey("mir_master.id"))
-    panel_id = Column(String, nullable=False)
+# Resolve relationships once at import rather than on the first query
+configure_mappers()
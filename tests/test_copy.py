@@ -0,0 +1,109 @@
+import errno
+import fcntl
+import os
+
+import pytest
+
+
+def test_fast_copy(main, tmp_path):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+
+    main.fast_copy(str(src), str(tmp_path / "dst.pdf"))
+
+    assert (tmp_path / "dst.pdf").read_bytes() == src.read_bytes()
+
+
+def test_fast_copy_falls_back_on_short_copy(main, tmp_path, monkeypatch):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(os.urandom(2 * 1024 * 1024))
+    real_copy_file_range = os.copy_file_range
+    calls = []
+
+    def short_copy_file_range(fd_in, fd_out, count, *args):
+        # Copy one chunk, then report 0 early as some filesystems do
+        calls.append(count)
+        if len(calls) > 1:
+            return 0
+        return real_copy_file_range(fd_in, fd_out, 4096, *args)
+
+    monkeypatch.setattr(os, "copy_file_range", short_copy_file_range)
+    main.fast_copy(str(src), str(tmp_path / "dst.pdf"))
+
+    assert len(calls) == 2
+    assert (tmp_path / "dst.pdf").read_bytes() == src.read_bytes()
+
+
+def test_fast_copy_without_copy_file_range(main, tmp_path, monkeypatch):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(os.urandom(1024 * 1024 + 1))
+
+    monkeypatch.delattr(os, "copy_file_range")
+    main.fast_copy(str(src), str(tmp_path / "dst.pdf"))
+
+    assert (tmp_path / "dst.pdf").read_bytes() == src.read_bytes()
+
+
+def fail_with(err):
+    def fail(*args):
+        raise OSError(err, os.strerror(err))
+    return fail
+
+
+def test_link_or_copy_hardlinks(main, tmp_path):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(b"%PDF-1.4\n")
+
+    main.link_or_copy(str(src), str(tmp_path / "dst.pdf"))
+
+    assert os.stat(tmp_path / "dst.pdf").st_ino == os.stat(src).st_ino
+
+
+def test_link_or_copy_falls_back_to_full_copy(main, tmp_path, monkeypatch):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(os.urandom(1024 * 1024))
+
+    monkeypatch.setattr(os, "link", fail_with(errno.EXDEV))
+    monkeypatch.setattr(fcntl, "ioctl", fail_with(errno.EOPNOTSUPP))
+    main.link_or_copy(str(src), str(tmp_path / "dst.pdf"))
+
+    assert os.stat(tmp_path / "dst.pdf").st_ino != os.stat(src).st_ino
+    assert (tmp_path / "dst.pdf").read_bytes() == src.read_bytes()
+
+
+def test_link_or_copy_removes_failed_reflink_target(main, tmp_path, monkeypatch):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(b"%PDF-1.4\n")
+    dst = tmp_path / "dst.pdf"
+
+    def failing_copy(src_path, dst_path):
+        raise OSError(errno.EIO, "copy failed")
+
+    monkeypatch.setattr(os, "link", fail_with(errno.EXDEV))
+    monkeypatch.setattr(fcntl, "ioctl", fail_with(errno.EOPNOTSUPP))
+    monkeypatch.setattr(main, "fast_copy", failing_copy)
+    with pytest.raises(OSError):
+        main.link_or_copy(str(src), str(dst))
+
+    assert not dst.exists()
+
+
+def test_link_or_copy_rerun_leaves_source_intact(main, tmp_path, monkeypatch):
+    src = tmp_path / "src.pdf"
+    content = os.urandom(64 * 1024)
+    src.write_bytes(content)
+    dst = tmp_path / "dst.pdf"
+    src_ino = os.stat(src).st_ino
+
+    main.link_or_copy(str(src), str(dst))
+    assert os.stat(dst).st_ino == src_ino
+
+    # Re-run over the existing hardlink through the reflink and copy paths
+    monkeypatch.setattr(os, "link", fail_with(errno.EXDEV))
+    monkeypatch.setattr(fcntl, "ioctl", fail_with(errno.EOPNOTSUPP))
+    main.link_or_copy(str(src), str(dst))
+
+    assert os.stat(src).st_ino == src_ino
+    assert os.stat(src).st_nlink == 1
+    assert src.read_bytes() == content
+    assert dst.read_bytes() == content
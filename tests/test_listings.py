@@ -0,0 +1,48 @@
+from datetime import datetime
+
+
+def test_project_listing_shape(client):
+    created = client.post("/projects", json={"project_name": "Tower A", "project_code": "TWA", "location": "Dubai"})
+    assert created.status_code == 200
+    project = created.json()
+    assert project == {"id": project["id"], "project_name": "Tower A", "project_code": "TWA", "location": "Dubai"}
+
+    listed = [p for p in client.get("/projects").json() if p["id"] == project["id"]]
+    assert listed == [project]
+
+
+def test_qc_log_listing_shape(main, client):
+    project_id = client.post("/projects", json={"project_name": "Tower B", "project_code": "TWB"}).json()["id"]
+    production_log_id = client.post(
+        "/production-logs",
+        json={"panel_id": "TWB-P1", "product_type": "Wall", "quantity": 2, "project_id": project_id},
+    ).json()["id"]
+
+    # There is no endpoint that creates QC logs
+    db = main.SessionLocal()
+    try:
+        qc_log = main.QCLog(
+            panel_id="TWB-P1",
+            inspection_date=datetime(2026, 1, 2, 3, 4, 5),
+            inspector_name="Inspector",
+            remarks="OK",
+            project_id=project_id,
+            production_log_id=production_log_id,
+        )
+        db.add(qc_log)
+        db.commit()
+        qc_log_id = qc_log.id
+    finally:
+        db.close()
+
+    listed = [q for q in client.get("/qc-logs").json() if q["id"] == qc_log_id]
+    assert listed == [{
+        "id": qc_log_id,
+        "panel_id": "TWB-P1",
+        "inspection_date": "2026-01-02T03:04:05",
+        "inspector_name": "Inspector",
+        "status": "Pending",
+        "remarks": "OK",
+        "project_id": project_id,
+        "production_log_id": production_log_id,
+    }]
@@ -0,0 +1,49 @@
+import os
+import resource
+
+import pikepdf
+
+
+def write_pdf(path, width):
+    pdf = pikepdf.Pdf.new()
+    pdf.add_blank_page(page_size=(width, 100))
+    pdf.save(path)
+
+
+def test_merge_mir_pdfs_orders_groups(main):
+    project_id = 1
+    source_files = f"storage/project_{project_id}/MIR/MRG-MIR-0001/source_files"
+    os.makedirs(source_files)
+    for name, width in [("PHOTO_a.pdf", 500), ("MIR_FORM_x.pdf", 100), ("DRAWING_b.pdf", 400),
+                        ("DRAWING_a.pdf", 300), ("PANEL_LIST_x.pdf", 200), ("other.pdf", 900)]:
+        write_pdf(os.path.join(source_files, name), width)
+
+    output_pdf = main.merge_mir_pdfs(main.mir_paths(project_id, "MRG", "MRG-MIR-0001"))
+
+    assert output_pdf == f"storage/project_{project_id}/MIR/MRG-MIR-0001/FINAL_MIR.pdf"
+    assert not os.path.exists(f"{output_pdf}.tmp")
+    with pikepdf.open(output_pdf) as merged:
+        assert [int(page.mediabox[2]) for page in merged.pages] == [100, 200, 300, 400, 500]
+
+
+def test_merge_mir_pdfs_within_descriptor_limit(main):
+    paths = main.mir_paths(2, "MRG", "MRG-MIR-0002")
+    os.makedirs(paths.source_files)
+    inputs = 300
+    for n in range(inputs):
+        write_pdf(os.path.join(paths.source_files, f"PHOTO_{n:04d}.pdf"), 100 + n)
+
+    # Leave room for the descriptors already open plus one batch, but far
+    # fewer than one per input
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = len(os.listdir("/proc/self/fd")) + main.MERGE_BATCH_SIZE + 32
+    assert limit < inputs
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    try:
+        output_pdf = main.merge_mir_pdfs(paths)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    with pikepdf.open(output_pdf) as merged:
+        assert [int(page.mediabox[2]) for page in merged.pages] == [100 + n for n in range(inputs)]
+    assert os.listdir(paths.merged_pdf) == []
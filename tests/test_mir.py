@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+
+def test_mir_paths_use_number_as_folder_name(main):
+    paths = main.mir_paths(1, "PRJ", "PRJ-MIR-0001")
+    assert paths.label == "PRJ-MIR-0001"
+    assert paths.base == "storage/project_1/MIR/PRJ-MIR-0001"
+    assert paths.final_pdf == "storage/project_1/MIR/PRJ-MIR-0001/FINAL_MIR.pdf"
+
+
+def test_mir_paths_legacy_number(main):
+    paths = main.mir_paths(1, "PRJ", "MIR-0001")
+    assert paths.label == "PRJ-MIR-0001"
+    assert paths.base == "storage/project_1/MIR/PRJ-MIR-0001"
+
+
+def test_mir_number_not_prefixed_twice(main, client):
+    project_id = client.post("/projects", json={"project_name": "P", "project_code": "PRJ"}).json()["id"]
+
+    db = main.SessionLocal()
+    try:
+        mir_number = main.generate_mir_number(project_id, "PRJ", db)
+        assert mir_number == "PRJ-MIR-0001"
+        main.create_mir_folder(main.mir_paths(project_id, "PRJ", mir_number), "P", ["A1"])
+    finally:
+        db.close()
+
+    with open(f"storage/project_{project_id}/MIR/PRJ-MIR-0001/index.txt") as f:
+        assert f.readline() == "MIR Number: PRJ-MIR-0001\n"
+
+    with open(f"storage/project_{project_id}/MIR/PRJ-MIR-0001/FINAL_MIR.pdf", "wb") as f:
+        f.write(b"%PDF-1.4\n")
+
+    response = client.get(f"/projects/{project_id}/mir/{mir_number}/pdf")
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="PRJ-MIR-0001.pdf"'
+
+
+def test_finalize_mir_marks_failure(main, client, monkeypatch):
+    project_id = client.post("/projects", json={"project_name": "P", "project_code": "FIN"}).json()["id"]
+
+    def broken_panel_list(project_id, mir_number, panel_ids, db_session):
+        # Leave the session needing a rollback, as a failed flush would
+        db_session.add(main.MIRMaster(project_id=project_id, mir_number=mir_number))
+        try:
+            db_session.flush()
+        except Exception:
+            pass
+        raise RuntimeError("generation failed")
+
+    monkeypatch.setattr(main, "generate_mir_cover_page", lambda *args: None, raising=False)
+    monkeypatch.setattr(main, "generate_panel_list_pdf", broken_panel_list, raising=False)
+
+    with pytest.raises(RuntimeError, match="generation failed"):
+        client.post(f"/projects/{project_id}/mir", json=["A1"])
+
+    mirs = client.get(f"/projects/{project_id}/mir/list").json()["mirs"]
+    assert [(m["mir_number"], m["status"]) for m in mirs] == [("FIN-MIR-0001", "Failed")]
+
+
+def test_finalize_mir_missing_row(main):
+    main.finalize_mir(999999, 1, "NONE-MIR-0001", [])
+
+
+def test_concurrent_mirs_get_distinct_numbers(main, client, monkeypatch):
+    project_id = client.post("/projects", json={"project_name": "P", "project_code": "CON"}).json()["id"]
+    monkeypatch.setattr(main, "finalize_mir", lambda *args: None)
+
+    def create():
+        return client.post(f"/projects/{project_id}/mir", json=["A1"])
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        responses = list(pool.map(lambda _: create(), range(20)))
+
+    assert [response.status_code for response in responses] == [200] * 20
+    assert sorted(response.json()["mir_number"] for response in responses) == [
+        f"CON-MIR-{n:04d}" for n in range(1, 21)
+    ]
+
+
+def test_finalize_mir_keeps_error_when_failed_commit_fails(main, client, monkeypatch):
+    project_id = client.post("/projects", json={"project_name": "P", "project_code": "LCK"}).json()["id"]
+    db = main.SessionLocal()
+    try:
+        mir = main.MIRMaster(project_id=project_id, mir_number="LCK-MIR-0001", status="Processing")
+        db.add(mir)
+        db.commit()
+        mir_id = mir.id
+    finally:
+        db.close()
+
+    def generation_failed(*args):
+        raise RuntimeError("generation failed")
+
+    real_session = main.SessionLocal
+
+    def locked_session():
+        session = real_session()
+
+        def locked_commit():
+            raise OperationalError("COMMIT", {}, Exception("database is locked"))
+
+        session.commit = locked_commit
+        return session
+
+    monkeypatch.setattr(main, "generate_mir_cover_page", generation_failed, raising=False)
+    monkeypatch.setattr(main, "SessionLocal", locked_session)
+
+    with pytest.raises(RuntimeError, match="generation failed") as excinfo:
+        main.finalize_mir(mir_id, project_id, "LCK-MIR-0001", [])
+    assert isinstance(excinfo.value.__cause__, OperationalError)
+
+
+def test_list_flags_stale_processing_mirs(main, client):
+    project_id = client.post("/projects", json={"project_name": "P", "project_code": "STL"}).json()["id"]
+    db = main.SessionLocal()
+    try:
+        old = datetime.utcnow() - main.MIR_PROCESSING_TIMEOUT - timedelta(minutes=1)
+        db.add_all([
+            main.MIRMaster(project_id=project_id, mir_number="STL-MIR-0001", status="Processing", created_at=old),
+            main.MIRMaster(project_id=project_id, mir_number="STL-MIR-0002", status="Processing"),
+            main.MIRMaster(project_id=project_id, mir_number="STL-MIR-0003", status="Final", created_at=old),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    mirs = client.get(f"/projects/{project_id}/mir/list").json()["mirs"]
+    assert [(m["mir_number"], m["stale"]) for m in mirs] == [
+        ("STL-MIR-0001", True),
+        ("STL-MIR-0002", False),
+        ("STL-MIR-0003", False),
+    ]